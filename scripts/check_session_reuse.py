@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Vérifie le choix reuse/extend/search de ConversationSession.plan
+avec des embeddings fixes d'ordre de grandeur réaliste (cosinus
+question/passage autour de 0.45, comme all-MiniLM-L6-v2).
+
+Usage: python scripts/check_session_reuse.py
+"""
+
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.session import ConversationSession
+
+DIM = 384
+rng = np.random.default_rng(42)
+
+
+def unit(vector):
+    return vector / np.linalg.norm(vector)
+
+
+def noise():
+    return unit(rng.normal(size=DIM))
+
+
+topic = noise()        # sujet des documents ("les points du rapport")
+other_topic = noise()  # sujet sans rapport
+generic = noise()      # "et le deuxième point ?" : presque aucun contenu propre
+
+first_question = unit(topic + noise())
+chunks = [
+    {"id": f"c{i}", "text": f"chunk {i}", "metadata": {}, "embedding": unit(topic + 1.2 * noise())}
+    for i in range(3)
+]
+
+
+def new_session():
+    session = ConversationSession("check")
+    session.update(first_question, chunks)
+    return session
+
+
+def check(label, question, embedding, expected, top_k=3, prefer_reuse=False):
+    plan = new_session().plan(question, embedding, top_k, prefer_reuse=prefer_reuse)
+    hit = max(float(chunk["embedding"] @ embedding) for chunk in chunks)
+    print(f"{label:<28} cos(question précédente)={float(first_question @ embedding):.2f} "
+          f"cos(meilleur chunk)={hit:.2f} -> {plan['mode']}"
+          f" (conservés: {len(plan['kept'])}, forcé: {plan['forced']})")
+    assert plan["mode"] in expected, f"{label}: {plan['mode']} au lieu de {expected}"
+    return plan
+
+
+print(f"Tour 1 : cos(question, meilleur chunk) = "
+      f"{new_session().best_hit_similarity():.2f}\n")
+
+followup = unit(generic + 0.3 * topic)
+check("Relance courte", "et le deuxième point ?", followup, ("reuse", "extend"))
+
+rephrased = unit(first_question + 0.3 * noise())
+check("Question reformulée", "quels sont les points principaux du rapport ?",
+      rephrased, ("reuse",))
+
+check("Plus de contextes (top-k)", "quels sont les points principaux du rapport ?",
+      rephrased, ("extend",), top_k=6)
+
+unrelated = unit(other_topic + noise())
+check("Nouveau sujet", "quelle est la politique de remboursement des frais de déplacement ?",
+      unrelated, ("search",))
+
+plan = check("Relance, budget serré", "et le deuxième point ?", followup, ("reuse",),
+             prefer_reuse=True)
+assert plan["forced"], "la réutilisation aurait dû être imposée par le budget"
+
+print("\n✓ Choix de retrieval conformes")
@@ -9,6 +9,16 @@ import tempfile
 from typing import List
 from src.config import Config
 from src.rag_service import RAGService
+from src.deadline import Deadline
+
+# Choix de profilage de l'interface -> argument profile de RAGService
+# ("Échantillonnage" applique Config.PROFILING_SAMPLE_RATE)
+PROFILE_CHOICES = {
+    "Échantillonnage": None,
+    "Désactivé": False,
+    "CPU": "cpu",
+    "Mémoire": "memory"
+}
 
 class RAGGradioApp:
     """Application Gradio pour le système RAG"""
@@ -43,6 +53,12 @@ class RAGGradioApp:
                                 upload_btn = gr.Button("📤 Vectoriser et Stocker", variant="primary")
                                 reset_btn = gr.Button("🔄 Réinitialiser Base", variant="secondary")
                             
+                            upload_profile_radio = gr.Radio(
+                                choices=list(PROFILE_CHOICES),
+                                value="Échantillonnage",
+                                label="🔬 Profiler l'ingestion"
+                            )
+                            
                             status_output = gr.Textbox(
                                 label="Status",
                                 interactive=False,
@@ -81,6 +97,11 @@ class RAGGradioApp:
                                 step=1,
                                 label="Nombre de contextes (top-k)"
                             )
+                            profile_radio = gr.Radio(
+                                choices=list(PROFILE_CHOICES),
+                                value="Échantillonnage",
+                                label="🔬 Profiler la requête"
+                            )
                     
                     with gr.Accordion("📚 Sources Utilisées", open=False):
                         sources_output = gr.JSON(label="Sources")
@@ -91,7 +112,7 @@ class RAGGradioApp:
             # Événements
             upload_btn.click(
                 fn=self.process_documents,
-                inputs=[file_input],
+                inputs=[file_input, upload_profile_radio],
                 outputs=[status_output, stats_box]
             )
             
@@ -103,45 +124,63 @@ class RAGGradioApp:
             
             submit_btn.click(
                 fn=self.ask_question,
-                inputs=[question_input, chatbot, top_k_slider],
+                inputs=[question_input, chatbot, top_k_slider, profile_radio],
                 outputs=[chatbot, question_input, sources_output, metrics_output]
             )
             
             question_input.submit(
                 fn=self.ask_question,
-                inputs=[question_input, chatbot, top_k_slider],
+                inputs=[question_input, chatbot, top_k_slider, profile_radio],
                 outputs=[chatbot, question_input, sources_output, metrics_output]
             )
     
-    def process_documents(self, files: List[tempfile._TemporaryFileWrapper]):
+    def process_documents(self, files: List[tempfile._TemporaryFileWrapper], profile: str = "Échantillonnage"):
         """Traite les documents uploadés"""
         if not files:
             return "❌ Aucun fichier sélectionné", self.rag_service.get_system_info()
         
         try:
-            result = self.rag_service.process_and_store_documents(files)
+            # None = laisser le taux d'échantillonnage décider
+            result = self.rag_service.process_and_store_documents(files, PROFILE_CHOICES.get(profile))
             
             if result["success"]:
                 message = f"✅ {result['message']} ({result['total_chunks']} chunks)"
             else:
                 message = f"❌ {result['message']}"
             
+            if "profile" in result:
+                message += f"\n🔬 Profil ({result['profile']['mode']}): {result['profile']['flamegraph']}"
+            
             return message, self.rag_service.get_system_info()
             
         except Exception as e:
             return f"❌ Erreur: {str(e)[:200]}", self.rag_service.get_system_info()
     
-    def ask_question(self, question: str, chat_history, top_k: int):
+    def ask_question(self, question: str, chat_history, top_k: int, profile: str = "Échantillonnage",
+                     request: gr.Request = None):
         """Traite une question et retourne la réponse - FORMAT CORRIGÉ"""
         if not question.strip():
             return chat_history, "", {}, {}
         
+        # Le budget de temps démarre à la réception de la question
+        deadline = Deadline(Config.REQUEST_DEADLINE)
+        
+        # Une session Gradio = une conversation ; historique vide = nouvelle conversation
+        session_id = request.session_hash if request else None
+        if session_id and not chat_history:
+            self.rag_service.end_session(session_id)
+        
         # Ajouter la question au format Gradio moderne
         chat_history.append({"role": "user", "content": question})
         
         try:
             # Générer la réponse
-            response = self.rag_service.generate_answer(question, top_k)
+            response = self.rag_service.generate_answer(
+                question, top_k,
+                profile=PROFILE_CHOICES.get(profile),
+                session_id=session_id,
+                deadline=deadline
+            )
             
             # Ajouter la réponse au format Gradio moderne
             chat_history.append({"role": "assistant", "content": response["answer"]})
@@ -19,6 +19,44 @@ class Config:
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
     TOP_K_RESULTS = 3
+    MAX_TOKENS = 500
+    GROQ_MAX_RETRIES = 2  # nouvelles tentatives sous budget (défaut du SDK Groq)
+    GROQ_RETRY_DELAY = 0.5  # première pause entre tentatives, doublée ensuite
+    
+    # Budget de latence par requête (dégradation progressive)
+    REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "0"))  # secondes, 0 = désactivé
+    DEADLINE_RERANK_BUDGET = 6.0  # temps restant minimal pour reranker
+    DEADLINE_GENERATION_BUDGET = 8.0  # en dessous : moins de contexte et de tokens
+    DEADLINE_MIN_GENERATION_BUDGET = 1.5  # en dessous : sources sans réponse du LLM
+    DEADLINE_REDUCED_TOP_K = 2
+    DEADLINE_MIN_MAX_TOKENS = 128
+    
+    # Sessions de conversation (réutilisation du retrieval entre les tours)
+    SESSION_IDLE_TTL = 1800  # secondes d'inactivité avant expiration
+    SESSION_MAX_COUNT = 200
+    # (toutes les similarités sont des cosinus)
+    SESSION_REUSE_THRESHOLD = 0.8  # question / dernier tour : réutiliser
+    SESSION_EXTEND_THRESHOLD = 0.55  # question / dernier tour : compléter
+    SESSION_FOLLOWUP_MAX_WORDS = 6  # question courte = relance du tour précédent
+    SESSION_CONTEXT_WEIGHT = 1.5  # poids de la question précédente pour une relance
+    SESSION_CHUNK_RELATIVE_MIN = 0.7  # part du meilleur score du tour précédent
+    SESSION_REUSE_MARGIN = 0.15  # écart max avec le meilleur chunk réutilisé
+    
+    # Reranking (cross-encoder CPU entre la recherche et le contexte)
+    RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANK_CANDIDATES = 20  # candidats récupérés avant reranking
+    RERANK_TOP_N = 3  # chunks envoyés au LLM après reranking
+    RERANK_BATCH_SIZE = 32
+    RERANK_CACHE_SIZE = 5000  # scores (question, chunk) mémorisés
+    
+    # Profilage (CPU ou mémoire, fichiers "folded" pour flamegraph)
+    PROFILING_DIR = os.getenv("PROFILING_DIR", "profiles")
+    PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))  # 0 = uniquement à la demande
+    PROFILING_MODE = os.getenv("PROFILING_MODE", "cpu")  # "cpu" ou "memory" (exclusifs)
+    PROFILING_INTERVAL = 0.005  # secondes entre deux échantillons CPU
+    PROFILING_TRACEMALLOC_FRAMES = 10  # profondeur des piles mémoire (coût du traçage)
+    PROFILING_TOP_ALLOCATIONS = 10
     
     @staticmethod
     def check_env():
@@ -2,6 +2,7 @@ import chromadb
 from chromadb.config import Settings
 from typing import List, Dict, Any, Optional
 import uuid
+import numpy as np
 from src.config import Config
 from src.embeddings import EmbeddingService
 
@@ -72,13 +73,16 @@ class VectorDatabase:
         print(f"✓ {len(documents)} documents ajoutés à la base vectorielle")
         return len(documents)
     
-    def search(self, query: str, top_k: int = None) -> List[Dict[str, Any]]:
+    def search(self, query: str, top_k: int = None, query_embedding: np.ndarray = None,
+               include_embeddings: bool = False) -> List[Dict[str, Any]]:
         """
         Recherche les documents les plus similaires à la requête
         
         Args:
             query: Texte de la requête
             top_k: Nombre de résultats (par défaut: Config.TOP_K_RESULTS)
+            query_embedding: Embedding déjà calculé de la requête (évite un second encodage)
+            include_embeddings: Ajoute l'embedding de chaque chunk sous la clé 'embedding'
         
         Returns:
             Liste de documents avec score de similarité
@@ -86,11 +90,22 @@ class VectorDatabase:
         if top_k is None:
             top_k = Config.TOP_K_RESULTS
         
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=top_k,
-            include=["documents", "metadatas", "distances"]
-        )
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+        
+        if query_embedding is not None:
+            results = self.collection.query(
+                query_embeddings=[np.asarray(query_embedding).tolist()],
+                n_results=top_k,
+                include=include
+            )
+        else:
+            results = self.collection.query(
+                query_texts=[query],
+                n_results=top_k,
+                include=include
+            )
         
         # Formatage des résultats
         documents = []
@@ -102,10 +117,26 @@ class VectorDatabase:
                     "score": 1.0 - (results["distances"][0][i] if results["distances"] else 0),
                     "id": results["ids"][0][i] if results["ids"] else None
                 }
+                if include_embeddings and results.get("embeddings") is not None:
+                    doc["embedding"] = np.asarray(results["embeddings"][0][i], dtype=np.float32)
                 documents.append(doc)
         
         return documents
     
+    def score_embeddings(self, query_embedding: np.ndarray, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Calcule les scores de similarité comme search() (distance L2 de ChromaDB)
+        
+        Args:
+            query_embedding: Embedding de la requête
+            embeddings: Matrice des embeddings des chunks
+        
+        Returns:
+            np.ndarray - Un score par chunk
+        """
+        distances = np.sum((np.asarray(embeddings) - query_embedding) ** 2, axis=1)
+        return 1.0 - distances
+    
     def get_collection_stats(self) -> Dict[str, Any]:
         """Retourne les statistiques de la collection"""
         count = self.collection.count()
@@ -0,0 +1,44 @@
+import time
+from typing import List, Dict, Any
+
+class Deadline:
+    """Budget de temps d'une requête, partagé entre les étapes du pipeline RAG"""
+
+    def __init__(self, budget: float):
+        """
+        Args:
+            budget: Durée maximale en secondes (0 ou None = pas de limite)
+        """
+        self.budget = budget or 0
+        self.start = time.time()
+        self.degradations: List[str] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    def elapsed(self) -> float:
+        """Temps écoulé depuis le début de la requête"""
+        return time.time() - self.start
+
+    def remaining(self) -> float:
+        """Temps restant (infini si pas de limite)"""
+        if not self.enabled:
+            return float("inf")
+        return max(0.0, self.budget - self.elapsed())
+
+    def degrade(self, name: str):
+        """Enregistre une dégradation appliquée pour tenir le budget"""
+        if name not in self.degradations:
+            self.degradations.append(name)
+            print(f"⚠️ Budget de latence: {name} ({self.remaining():.2f}s restantes)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques du budget pour les métriques"""
+        if not self.enabled:
+            return {}
+        return {
+            "deadline": self.budget,
+            "budget_remaining": round(self.remaining(), 2),
+            "degradations": list(self.degradations)
+        }
@@ -0,0 +1,202 @@
+import os
+import sys
+import time
+import uuid
+import random
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Dict, Any, Optional
+from src.config import Config
+
+# tracemalloc est global au processus : un seul profilage à la fois
+_profiling_lock = threading.Lock()
+
+
+PROFILING_MODES = ("cpu", "memory")
+
+
+def profiling_mode(profile=None) -> Optional[str]:
+    """
+    Décide si (et comment) une requête doit être profilée
+
+    Args:
+        profile: "cpu" ou "memory" pour forcer un mode, True pour le mode
+                 par défaut (Config.PROFILING_MODE), False pour désactiver,
+                 None pour appliquer le taux d'échantillonnage
+                 Config.PROFILING_SAMPLE_RATE
+
+    Returns:
+        Mode de profilage, ou None si la requête n'est pas profilée
+    """
+    if profile in PROFILING_MODES:
+        return profile
+    if profile is None:
+        rate = Config.PROFILING_SAMPLE_RATE
+        profile = rate > 0 and random.random() < rate
+    return Config.PROFILING_MODE if profile else None
+
+
+class RequestProfiler:
+    """
+    Profilage CPU ou mémoire d'une requête (ingestion ou chat)
+
+    - "cpu" : échantillonnage périodique de la pile du thread appelant
+    - "memory" : tracemalloc (pic et allocations par pile d'appels)
+
+    Les deux modes sont exclusifs : tracemalloc ralentit fortement le code
+    qui alloue beaucoup (pypdf, découpage), ce qui fausserait le profil CPU.
+    En mode "memory", la durée mesurée est donc gonflée par le traçage.
+    Le profil est écrit au format "folded stacks"
+    (compatible flamegraph.pl, speedscope, inferno).
+
+    Limites :
+    - le mode "cpu" n'échantillonne que le thread appelant ; le travail
+      délégué à d'autres threads (pool de l'encodeur, threads ChromaDB)
+      n'apparaît que comme du temps d'attente dans ce thread
+    - tracemalloc est global au processus : les allocations des autres
+      requêtes Gradio exécutées en parallèle sont incluses dans le profil
+      mémoire
+    """
+
+    def __init__(self, name: str, mode: str = None, output_dir: str = None, interval: float = None):
+        self.name = name
+        self.mode = mode or Config.PROFILING_MODE
+        if self.mode not in PROFILING_MODES:
+            raise ValueError(f"Mode de profilage inconnu: {self.mode}")
+        self.output_dir = output_dir or Config.PROFILING_DIR
+        self.interval = interval or Config.PROFILING_INTERVAL
+        self.report: Optional[Dict[str, Any]] = None
+
+        self._active = False
+        self._stop = threading.Event()
+        self._samples = Counter()
+        self._thread_id = None
+        self._sampler = None
+        self._started_tracemalloc = False
+        self._baseline = None
+        self._start_time = 0.0
+
+    def __enter__(self):
+        # Un seul profilage à la fois (tracemalloc est global au processus)
+        if not _profiling_lock.acquire(blocking=False):
+            print("⚠️ Profilage déjà en cours, requête non profilée")
+            return self
+
+        self._active = True
+
+        if self.mode == "memory":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(Config.PROFILING_TRACEMALLOC_FRAMES)
+                self._started_tracemalloc = True
+            tracemalloc.reset_peak()
+            self._baseline = tracemalloc.take_snapshot()
+        else:
+            self._thread_id = threading.get_ident()
+            self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+            self._sampler.start()
+
+        self._start_time = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._active:
+            return False
+
+        try:
+            duration = time.time() - self._start_time
+            os.makedirs(self.output_dir, exist_ok=True)
+            prefix = os.path.join(
+                self.output_dir,
+                f"{self.name}_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+            )
+
+            if self.mode == "memory":
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+                if self._started_tracemalloc:
+                    tracemalloc.stop()
+                details = self._write_memory_profile(f"{prefix}.mem.folded", snapshot, peak)
+            else:
+                self._stop.set()
+                self._sampler.join()
+                details = self._write_cpu_profile(f"{prefix}.cpu.folded")
+
+            self.report = {"mode": self.mode, "duration": round(duration, 2), **details}
+            print(f"✓ Profil '{self.name}' écrit: {self.report['flamegraph']}")
+        except Exception as e:
+            print(f"⚠️ Erreur écriture du profil: {e}")
+        finally:
+            self._active = False
+            _profiling_lock.release()
+
+        return False
+
+    def _sample_loop(self):
+        """Échantillonne la pile du thread profilé jusqu'à l'arrêt"""
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                module = frame.f_globals.get("__name__", "?")
+                stack.append(f"{module}:{frame.f_code.co_name}")
+                frame = frame.f_back
+
+            self._samples[";".join(reversed(stack))] += 1
+
+    def _write_cpu_profile(self, path: str) -> Dict[str, Any]:
+        """Écrit le profil CPU (poids = nombre d'échantillons)"""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self._samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        return {
+            "flamegraph": path,
+            "cpu_samples": sum(self._samples.values())
+        }
+
+    def _write_memory_profile(self, path: str, snapshot, peak: int) -> Dict[str, Any]:
+        """Écrit le profil mémoire (poids = octets alloués et non libérés pendant la requête)"""
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+        snapshot = snapshot.filter_traces(filters)
+        baseline = self._baseline.filter_traces(filters)
+        diff = snapshot.compare_to(baseline, "traceback")
+
+        with open(path, "w", encoding="utf-8") as f:
+            for stat in diff:
+                if stat.size_diff <= 0:
+                    continue
+                frames = ";".join(
+                    f"{self._short_path(frame.filename)}:{frame.lineno}"
+                    for frame in stat.traceback
+                )
+                f.write(f"{frames} {stat.size_diff}\n")
+
+        top_allocations = [
+            {
+                "location": f"{self._short_path(stat.traceback[-1].filename)}:{stat.traceback[-1].lineno}",
+                "size_kb": round(stat.size_diff / 1024, 1),
+                "count": stat.count_diff
+            }
+            for stat in snapshot.compare_to(baseline, "lineno")[:Config.PROFILING_TOP_ALLOCATIONS]
+            if stat.size_diff > 0
+        ]
+
+        return {
+            "flamegraph": path,
+            "memory_peak_mb": round(peak / (1024 * 1024), 2),
+            "memory_net_mb": round(sum(s.size_diff for s in diff) / (1024 * 1024), 2),
+            "top_allocations": top_allocations
+        }
+
+    @staticmethod
+    def _short_path(filename: str) -> str:
+        """Raccourcit un chemin de fichier aux deux derniers composants"""
+        parts = filename.replace("\\", "/").split("/")
+        return "/".join(parts[-2:])
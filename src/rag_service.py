@@ -1,8 +1,12 @@
 import time
-from typing import List, Dict, Any
-from groq import Groq
+import numpy as np
+from typing import List, Dict, Any, Tuple
+from groq import Groq, APITimeoutError, APIConnectionError, InternalServerError, RateLimitError
 from src.config import Config
+from src.deadline import Deadline
 from src.database import VectorDatabase
+from src.profiler import RequestProfiler, profiling_mode
+from src.session import SessionStore
 
 class RAGService:
     """Service principal RAG avec intégration Groq API"""
@@ -18,6 +22,16 @@ class RAGService:
         print(" - Initialisation client Groq...")
         self.groq_client = self._init_groq_client()
         
+        # 3. Sessions de conversation (réutilisation du retrieval)
+        self.sessions = SessionStore()
+        
+        # 4. Reranking optionnel (cross-encoder CPU)
+        self.reranker = None
+        if Config.RERANK_ENABLED:
+            print(" - Initialisation reranker...")
+            from src.reranker import RerankerService
+            self.reranker = RerankerService()
+        
         print("✓ Service RAG initialisé")
     
     def _init_groq_client(self):
@@ -55,16 +69,32 @@ class RAGService:
             traceback.print_exc()
             return None
     
-    def process_and_store_documents(self, files: List[Any]) -> Dict[str, Any]:
+    def process_and_store_documents(self, files: List[Any], profile=None) -> Dict[str, Any]:
         """
         Traite et stocke les documents uploadés
         
         Args:
             files: Liste de fichiers (depuis Gradio ou tuples)
+            profile: Mode de profilage ("cpu", "memory"), True pour le mode par
+                     défaut, False pour désactiver, None pour appliquer le taux
+                     d'échantillonnage
         
         Returns:
-            Dict avec statistiques
+            Dict avec statistiques (et liens vers le profil si profilé)
         """
+        mode = profiling_mode(profile)
+        if mode is None:
+            return self._process_and_store_documents(files)
+        
+        with RequestProfiler("ingest", mode) as profiler:
+            result = self._process_and_store_documents(files)
+        
+        if profiler.report:
+            result["profile"] = profiler.report
+        return result
+    
+    def _process_and_store_documents(self, files: List[Any]) -> Dict[str, Any]:
+        """Traitement et stockage des documents (sans profilage)"""
         from src.document_processor import DocumentProcessor
         
         processor = DocumentProcessor()
@@ -75,6 +105,9 @@ class RAGService:
         
         count = self.vector_db.add_documents(documents)
         
+        # Les chunks mémorisés ne reflètent plus la base
+        self.sessions.clear()
+        
         return {
             "success": True,
             "message": f"{count} documents traités et stockés",
@@ -82,20 +115,61 @@ class RAGService:
             "total_chunks": len(documents)
         }
     
-    def generate_answer(self, question: str, top_k: int = None) -> Dict[str, Any]:
+    def generate_answer(self, question: str, top_k: int = None, profile=None,
+                        session_id: str = None, deadline: Deadline = None) -> Dict[str, Any]:
         """
         Génère une réponse à une question en utilisant le RAG
         
         Args:
             question: Question de l'utilisateur
             top_k: Nombre de contextes à récupérer
+            profile: Mode de profilage ("cpu", "memory"), True pour le mode par
+                     défaut, False pour désactiver, None pour appliquer le taux
+                     d'échantillonnage
+            session_id: Identifiant de conversation pour réutiliser le retrieval
+                        du tour précédent (None = recherche systématique)
+            deadline: Budget de temps de la requête, démarré à sa réception
+                      (par défaut: Config.REQUEST_DEADLINE à partir de maintenant)
         
         Returns:
             Dict avec réponse et métadonnées
         """
+        if deadline is None:
+            deadline = Deadline(Config.REQUEST_DEADLINE)
+        
+        mode = profiling_mode(profile)
+        if mode is None:
+            return self._generate_answer(question, top_k, session_id, deadline)
+        
+        # Profilage demandé explicitement : sans budget, le profil montre le
+        # pipeline complet et non un chemin dégradé par son propre surcoût.
+        # Les requêtes échantillonnées (profile=None) gardent leur budget.
+        explicit = profile is not None
+        with RequestProfiler("chat", mode) as profiler:
+            result = self._generate_answer(
+                question, top_k, session_id,
+                Deadline(0) if explicit else deadline
+            )
+        
+        if profiler.report:
+            result["stats"]["profile"] = profiler.report
+        if explicit and deadline.enabled:
+            result["stats"]["deadline"] = "désactivé (profilage)"
+        return result
+    
+    def _generate_answer(self, question: str, top_k: int, session_id: str,
+                         deadline: Deadline) -> Dict[str, Any]:
+        """Pipeline RAG complet : recherche, prompt, génération (sans profilage)"""
+        if top_k is None:
+            top_k = Config.TOP_K_RESULTS
+        
+        # Avec reranking, on récupère un ensemble de candidats plus large
+        use_rerank = self.reranker is not None
+        fetch_k = max(top_k, Config.RERANK_CANDIDATES) if use_rerank else top_k
+        
         # 1. Recherche de contextes pertinents
         start_time = time.time()
-        relevant_docs = self.vector_db.search(question, top_k)
+        relevant_docs, retrieval_stats = self._retrieve(question, fetch_k, session_id, deadline)
         search_time = time.time() - start_time
         
         if not relevant_docs:
@@ -106,10 +180,31 @@ class RAGService:
                     "search_time": search_time,
                     "generation_time": 0,
                     "total_time": search_time,
-                    "documents_used": 0
+                    "documents_used": 0,
+                    **retrieval_stats,
+                    **deadline.get_stats()
                 }
             }
         
+        # 1bis. Reranking des candidats (si le budget le permet encore)
+        rerank_time = 0
+        rerank_stats = {}
+        if use_rerank and deadline.remaining() < Config.DEADLINE_RERANK_BUDGET:
+            use_rerank = False
+            deadline.degrade("rerank_skipped")
+        if use_rerank:
+            start_rerank = time.time()
+            relevant_docs, rerank_stats = self._rerank(question, relevant_docs, top_k)
+            rerank_time = time.time() - start_rerank
+            rerank_stats["rerank_time"] = round(rerank_time, 3)
+        else:
+            relevant_docs = relevant_docs[:top_k]
+        
+        # Recherche lente : moins de contexte pour accélérer la génération
+        if deadline.remaining() < Config.DEADLINE_GENERATION_BUDGET and len(relevant_docs) > Config.DEADLINE_REDUCED_TOP_K:
+            relevant_docs = relevant_docs[:Config.DEADLINE_REDUCED_TOP_K]
+            deadline.degrade("reduced_top_k")
+        
         # 2. Construction du contexte
         context = self._build_context(relevant_docs)
         
@@ -119,10 +214,23 @@ class RAGService:
             question=question
         )
         
-        # 4. Génération avec Groq
+        # 4. Génération avec Groq, bornée par le temps restant
         start_gen = time.time()
-        try:
-            response = self.groq_client.chat.completions.create(
+        remaining = deadline.remaining()
+        if remaining < Config.DEADLINE_MIN_GENERATION_BUDGET:
+            deadline.degrade("llm_skipped")
+            answer = self._sources_only_answer()
+            generation_time = 0
+        else:
+            max_tokens = Config.MAX_TOKENS
+            if remaining < Config.DEADLINE_GENERATION_BUDGET:
+                max_tokens = max(
+                    Config.DEADLINE_MIN_MAX_TOKENS,
+                    int(Config.MAX_TOKENS * remaining / Config.DEADLINE_GENERATION_BUDGET)
+                )
+                deadline.degrade("max_tokens_reduced")
+            
+            request = dict(
                 messages=[
                     {
                         "role": "system",
@@ -135,16 +243,31 @@ class RAGService:
                 ],
                 model=Config.GROQ_MODEL,
                 temperature=0.1,
-                max_tokens=500,
+                max_tokens=max_tokens,
                 top_p=0.9
             )
             
-            answer = response.choices[0].message.content
-            generation_time = time.time() - start_gen
-            
-        except Exception as e:
-            answer = f"Erreur lors de la génération: {str(e)}"
-            generation_time = time.time() - start_gen
+            try:
+                if deadline.enabled:
+                    response = self._create_completion_within(deadline, request)
+                else:
+                    response = self.groq_client.chat.completions.create(**request)
+                
+                answer = response.choices[0].message.content
+                generation_time = time.time() - start_gen
+                
+            except APITimeoutError:
+                deadline.degrade("generation_timeout")
+                answer = self._sources_only_answer()
+                generation_time = time.time() - start_gen
+            except (RateLimitError, InternalServerError, APIConnectionError):
+                # Tentatives épuisées (429, 5xx, réseau) : sources seules
+                deadline.degrade("generation_failed")
+                answer = self._sources_only_answer("⚠️ Service de génération indisponible")
+                generation_time = time.time() - start_gen
+            except Exception as e:
+                answer = f"Erreur lors de la génération: {str(e)}"
+                generation_time = time.time() - start_gen
         
         # 5. Formatage des sources
         sources = [
@@ -152,7 +275,8 @@ class RAGService:
                 "content": doc["text"][:200] + "..." if len(doc["text"]) > 200 else doc["text"],
                 "source": doc["metadata"].get("source", "Inconnu"),
                 "score": round(doc["score"], 3),
-                "chunk": doc["metadata"].get("chunk_index", 0) + 1
+                "chunk": doc["metadata"].get("chunk_index", 0) + 1,
+                **({"rerank_score": round(doc["rerank_score"], 3)} if "rerank_score" in doc else {})
             }
             for doc in relevant_docs
         ]
@@ -163,11 +287,163 @@ class RAGService:
             "stats": {
                 "search_time": round(search_time, 2),
                 "generation_time": round(generation_time, 2),
-                "total_time": round(search_time + generation_time, 2),
-                "documents_used": len(relevant_docs)
+                "total_time": round(search_time + rerank_time + generation_time, 2),
+                "documents_used": len(relevant_docs),
+                "context_chars": len(context),
+                **retrieval_stats,
+                **rerank_stats,
+                **deadline.get_stats()
             }
         }
     
+    def _rerank(self, question: str, candidates: List[Dict[str, Any]],
+                top_k: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Réordonne les candidats avec le cross-encoder et garde les meilleurs
+        
+        Returns:
+            Tuple (documents retenus, statistiques de reranking)
+        """
+        keep = min(top_k, Config.RERANK_TOP_N)
+        documents, cache_hits = self.reranker.rerank(question, candidates, keep)
+        
+        # Taille du contexte qu'aurait produit la recherche vectorielle seule
+        # (les candidats d'une session réutilisée ne sont pas triés par score)
+        by_score = sorted(candidates, key=lambda doc: doc["score"], reverse=True)
+        chars_before = len(self._build_context(by_score[:top_k]))
+        chars_after = len(self._build_context(documents))
+        
+        return documents, {
+            "rerank_candidates": len(candidates),
+            "rerank_cache_hits": cache_hits,
+            "context_chars_before_rerank": chars_before,
+            "prompt_reduction_pct": round(100 * (1 - chars_after / chars_before)) if chars_before else 0
+        }
+    
+    def _retrieve(self, question: str, top_k: int = None, session_id: str = None,
+                  deadline: Deadline = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Recherche les contextes en réutilisant si possible le tour précédent
+        
+        - reuse : relance sur les mêmes passages, toujours pertinents, aucune recherche
+        - extend : passages encore pertinents complétés par une recherche réduite
+        - search : nouvelle question, recherche complète
+        
+        Le choix est fait par ConversationSession.plan. Si le budget est serré
+        après l'encodage de la question, les passages mémorisés encore
+        pertinents sont réutilisés plutôt que de chercher.
+        
+        Returns:
+            Tuple (documents, statistiques de retrieval)
+        """
+        if top_k is None:
+            top_k = Config.TOP_K_RESULTS
+        
+        if session_id is None:
+            return self.vector_db.search(question, top_k), {"retrieval_mode": "search"}
+        
+        session = self.sessions.get(session_id)
+        query_embedding = self.vector_db.embedding_service.embed_text(question)[0]
+        
+        tight = deadline is not None and deadline.remaining() < Config.DEADLINE_GENERATION_BUDGET
+        plan = session.plan(question, query_embedding, top_k, prefer_reuse=tight)
+        if plan["forced"]:
+            deadline.degrade("session_reuse_forced")
+        
+        mode = plan["mode"]
+        vector = plan["embedding"]
+        kept = self._rescore([doc for doc, _ in plan["kept"]], vector)
+        
+        if mode == "reuse":
+            best = plan["kept"][0][1]
+            documents = [
+                doc for doc, (_, similarity) in zip(kept, plan["kept"])
+                if similarity >= best - Config.SESSION_REUSE_MARGIN
+            ]
+            # On garde l'ensemble du tour d'origine pour les relances suivantes
+            session.update(vector, session.documents)
+        elif mode == "extend":
+            # Seuls les emplacements libres sont recherchés ; au moins un nouveau
+            # résultat pour que les passages mémorisés soient mis en concurrence.
+            # Un doublon signifie que le passage mémorisé figure déjà parmi les
+            # meilleurs : le contexte est alors simplement plus court.
+            fresh = self.vector_db.search(
+                question, max(1, top_k - len(kept)),
+                query_embedding=vector,
+                include_embeddings=True
+            )
+            merged = {doc["id"]: doc for doc in kept}
+            for doc in fresh:
+                merged.setdefault(doc["id"], doc)
+            documents = sorted(merged.values(), key=lambda doc: doc["score"], reverse=True)[:top_k]
+            session.update(vector, documents)
+        else:
+            documents = self.vector_db.search(
+                question, top_k,
+                query_embedding=vector,
+                include_embeddings=True
+            )
+            session.update(vector, documents)
+        
+        kept_ids = {doc["id"] for doc in kept}
+        similarity = plan["similarity"]
+        return documents, {
+            "retrieval_mode": mode,
+            "session_similarity": round(similarity, 3) if similarity is not None else None,
+            "followup": plan["followup"],
+            "chunks_reused": sum(1 for doc in documents if doc["id"] in kept_ids)
+        }
+    
+    def _rescore(self, documents: List[Dict[str, Any]], query_embedding: np.ndarray) -> List[Dict[str, Any]]:
+        """Recalcule les scores de chunks mémorisés pour une nouvelle question"""
+        if not documents:
+            return []
+        scores = self.vector_db.score_embeddings(
+            query_embedding,
+            np.vstack([doc["embedding"] for doc in documents])
+        )
+        return [dict(doc, score=float(score)) for doc, score in zip(documents, scores)]
+    
+    def end_session(self, session_id: str):
+        """Oublie le retrieval mémorisé d'une conversation"""
+        self.sessions.discard(session_id)
+    
+    def _create_completion_within(self, deadline: Deadline, request: Dict[str, Any]):
+        """
+        Appel Groq dont les nouvelles tentatives sont bornées par le budget
+        
+        Les tentatives du SDK sont désactivées : ses pauses (dont Retry-After,
+        jusqu'à 60s) pourraient dépasser l'échéance. Chaque tentative reçoit le
+        temps restant comme timeout, et une pause n'a lieu que s'il reste
+        ensuite au moins DEADLINE_MIN_GENERATION_BUDGET secondes.
+        """
+        delay = Config.GROQ_RETRY_DELAY
+        for attempt in range(Config.GROQ_MAX_RETRIES + 1):
+            client = self.groq_client.with_options(timeout=deadline.remaining(), max_retries=0)
+            try:
+                return client.chat.completions.create(**request)
+            except (RateLimitError, InternalServerError, APIConnectionError) as e:
+                if isinstance(e, APITimeoutError) or attempt == Config.GROQ_MAX_RETRIES:
+                    raise
+                wait = self._retry_after(e, delay)
+                if deadline.remaining() - wait < Config.DEADLINE_MIN_GENERATION_BUDGET:
+                    raise
+                time.sleep(wait)
+                delay *= 2
+    
+    def _retry_after(self, error: Exception, default: float) -> float:
+        """Pause demandée par l'API (en-tête Retry-After), sinon délai par défaut"""
+        response = getattr(error, "response", None)
+        try:
+            return float(response.headers.get("retry-after"))
+        except (AttributeError, TypeError, ValueError):
+            return default
+    
+    def _sources_only_answer(self, reason: str = "⏱️ Temps de réponse dépassé") -> str:
+        """Réponse dégradée lorsque le LLM ne peut pas répondre dans le budget"""
+        return (f"{reason} : aucune réponse générée. "
+                "Consultez les passages les plus pertinents dans les sources ci-dessous.")
+    
     def _build_context(self, documents: List[Dict[str, Any]]) -> str:
         """Construit le contexte à partir des documents pertinents"""
         context_parts = []
@@ -185,11 +461,15 @@ class RAGService:
             "vector_db": stats,
             "groq_model": Config.GROQ_MODEL,
             "embedding_model": Config.EMBEDDING_MODEL,
+            "rerank_model": Config.RERANK_MODEL if self.reranker else None,
             "chunk_size": Config.CHUNK_SIZE,
-            "top_k": Config.TOP_K_RESULTS
+            "top_k": Config.TOP_K_RESULTS,
+            "request_deadline": Config.REQUEST_DEADLINE or None,
+            "active_sessions": len(self.sessions)
         }
     
     def reset_database(self):
         """Réinitialise la base de données"""
         self.vector_db.reset_collection()
+        self.sessions.clear()
         return {"success": True, "message": "Base de données réinitialisée"}
\ No newline at end of file
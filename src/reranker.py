@@ -0,0 +1,57 @@
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Tuple
+from sentence_transformers import CrossEncoder
+from src.config import Config
+
+class RerankerService:
+    """Reranking des chunks candidats avec un cross-encoder sur CPU"""
+
+    def __init__(self):
+        print(f"Chargement du modèle de reranking: {Config.RERANK_MODEL}")
+        self.model = CrossEncoder(Config.RERANK_MODEL, device="cpu")
+        # Cache LRU des scores par (question exacte, chunk) : seule une question
+        # répétée à l'identique évite le modèle
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        print("✓ Modèle de reranking chargé")
+
+    def rerank(self, query: str, documents: List[Dict[str, Any]],
+               top_n: int) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Trie les documents par pertinence selon le cross-encoder
+
+        Args:
+            query: Question de l'utilisateur
+            documents: Chunks candidats (issus de VectorDatabase.search)
+            top_n: Nombre de chunks à conserver
+
+        Returns:
+            Tuple (top_n documents avec 'rerank_score', nombre de scores trouvés en cache)
+        """
+        keys = [(query, doc.get("id") or doc["text"]) for doc in documents]
+
+        with self._lock:
+            scores = [self._cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        # Un seul passage batché pour tous les couples absents du cache
+        if missing:
+            predictions = self.model.predict(
+                [(query, documents[i]["text"]) for i in missing],
+                batch_size=Config.RERANK_BATCH_SIZE,
+                show_progress_bar=False
+            )
+            for i, score in zip(missing, predictions):
+                scores[i] = float(score)
+
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._cache[key] = score
+                self._cache.move_to_end(key)
+            while len(self._cache) > Config.RERANK_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+        ranked = sorted(zip(documents, scores), key=lambda item: item[1], reverse=True)
+        reranked = [dict(doc, rerank_score=score) for doc, score in ranked[:top_n]]
+        return reranked, len(documents) - len(missing)
@@ -0,0 +1,164 @@
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+from src.config import Config
+
+
+class ConversationSession:
+    """État de retrieval d'une conversation : question et chunks du dernier tour"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.query_embedding: Optional[np.ndarray] = None
+        self.documents: List[Dict[str, Any]] = []
+        self.last_access = time.time()
+        self.turns = 0
+
+    def has_context(self) -> bool:
+        """Indique si un tour précédent peut être réutilisé"""
+        return self.query_embedding is not None and bool(self.documents)
+
+    def similarity(self, query_embedding: np.ndarray) -> float:
+        """
+        Similarité cosinus entre la nouvelle question et le dernier tour
+
+        Prend le maximum entre la question précédente et les chunks retenus :
+        une relance courte ("et le deuxième point ?") ressemble souvent plus
+        aux passages qu'à la question elle-même.
+        """
+        vectors = np.vstack([self.query_embedding] + [doc["embedding"] for doc in self.documents])
+        return float(np.max(vectors @ query_embedding))
+
+    def best_hit_similarity(self) -> float:
+        """Similarité cosinus entre la question du dernier tour et son meilleur chunk"""
+        embeddings = np.vstack([doc["embedding"] for doc in self.documents])
+        return float(np.max(embeddings @ self.query_embedding))
+
+    def contextualize(self, query_embedding: np.ndarray) -> np.ndarray:
+        """Lit une relance courte dans le contexte de la question précédente"""
+        vector = Config.SESSION_CONTEXT_WEIGHT * self.query_embedding + query_embedding
+        return vector / np.linalg.norm(vector)
+
+    def plan(self, question: str, query_embedding: np.ndarray, top_k: int,
+             prefer_reuse: bool = False) -> Dict[str, Any]:
+        """
+        Choisit comment obtenir les contextes du tour courant
+
+        Toutes les similarités sont des cosinus (embeddings normalisés). Un chunk
+        mémorisé est conservé s'il atteint SESSION_CHUNK_RELATIVE_MIN fois la
+        similarité du meilleur chunk du tour précédent avec sa propre question :
+        le seuil suit l'échelle réelle des scores du modèle.
+
+        Args:
+            question: Texte de la question
+            query_embedding: Embedding normalisé de la question
+            top_k: Nombre de contextes demandés
+            prefer_reuse: Réutiliser dès qu'un chunk mémorisé est conservé
+                          (budget de temps serré)
+
+        Returns:
+            Dict avec 'mode' (reuse/extend/search), 'embedding' (vecteur de
+            recherche), 'kept' (liste de (chunk, similarité) triée), 'similarity',
+            'followup' et 'forced' (reuse imposé par prefer_reuse)
+        """
+        plan = {
+            "mode": "search",
+            "embedding": query_embedding,
+            "kept": [],
+            "similarity": None,
+            "followup": False,
+            "forced": False
+        }
+        if not self.has_context():
+            return plan
+
+        similarity = self.similarity(query_embedding)
+        plan["similarity"] = similarity
+
+        # Relance courte ("et le deuxième point ?") : trop peu de contenu propre,
+        # elle est cherchée avec la question précédente
+        followup = len(question.split()) <= Config.SESSION_FOLLOWUP_MAX_WORDS
+        if followup:
+            plan["followup"] = True
+            plan["embedding"] = self.contextualize(query_embedding)
+
+        if similarity < Config.SESSION_EXTEND_THRESHOLD and not followup:
+            return plan
+
+        embeddings = np.vstack([doc["embedding"] for doc in self.documents])
+        similarities = embeddings @ plan["embedding"]
+        min_similarity = Config.SESSION_CHUNK_RELATIVE_MIN * self.best_hit_similarity()
+        plan["kept"] = [
+            (self.documents[i], float(similarities[i]))
+            for i in np.argsort(-similarities)
+            if similarities[i] >= min_similarity
+        ][:top_k]
+        if not plan["kept"]:
+            return plan
+
+        # Un top-k plus grand que le tour précédent impose une recherche
+        can_reuse = similarity >= Config.SESSION_REUSE_THRESHOLD and top_k <= len(self.documents)
+        if not can_reuse and prefer_reuse:
+            can_reuse = True
+            plan["forced"] = True
+        plan["mode"] = "reuse" if can_reuse else "extend"
+        return plan
+
+    def update(self, query_embedding: np.ndarray, documents: List[Dict[str, Any]]):
+        """Mémorise le tour courant"""
+        self.query_embedding = query_embedding
+        self.documents = [doc for doc in documents if doc.get("embedding") is not None]
+        self.turns += 1
+
+
+class SessionStore:
+    """Sessions de conversation en mémoire, expirées après inactivité"""
+
+    def __init__(self, idle_ttl: float = None, max_sessions: int = None):
+        self.idle_ttl = idle_ttl or Config.SESSION_IDLE_TTL
+        self.max_sessions = max_sessions or Config.SESSION_MAX_COUNT
+        # Ordre LRU : la session la moins récemment utilisée en tête
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> ConversationSession:
+        """Récupère (ou crée) la session et la marque comme active"""
+        with self._lock:
+            self._expire()
+
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                session = ConversationSession(session_id)
+            session.last_access = time.time()
+            self._sessions[session_id] = session
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+            return session
+
+    def discard(self, session_id: str):
+        """Supprime une session (nouvelle conversation)"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def clear(self):
+        """Supprime toutes les sessions (base modifiée ou réinitialisée)"""
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire()
+            return len(self._sessions)
+
+    def _expire(self):
+        """Supprime les sessions inactives depuis plus de idle_ttl"""
+        limit = time.time() - self.idle_ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_access >= limit:
+                break
+            del self._sessions[session_id]